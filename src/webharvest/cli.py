@@ -1,14 +1,18 @@
 import click
 import csv
 import asyncio
+from contextlib import nullcontext
 from rich.console import Console
 
-from .http import fetch_text_retry, fetch_many
-from .spiders.quotes import parse_quotes, page_url, BASE
+from .http import CircuitBreaker, fetch_text_retry, fetch_many, fetch_fanout
+from .spiders.quotes import parse_quotes, page_url, is_listing_url, BASE
 from .storage.sqlite import SqliteStore
 from .spiders import books as books_spider
-from .robots import fetch_disallows, is_allowed
-from typing import List, Dict
+from .robots import fetch_disallows, fetch_sitemaps, is_allowed
+from .sitemap import iter_sitemap_urls, parse_lastmod
+from datetime import datetime, timezone
+from typing import Callable, List, Dict
+from urllib.parse import urlparse
 from pathlib import Path
 
 console = Console()
@@ -50,25 +54,57 @@ def parse_quotes_cmd(page: int):
         console.print(f"- {r['text']} — {r['author']} [{', '.join(r['tags'])}]")
 
 
+def _sitemap_seed(
+    store: SqliteStore, base: str, since: str | None, keep: Callable[[str], bool]
+) -> tuple[List[str], str, str]:
+    """
+    Listing URLs from base's sitemaps changed since `since` (ISO date), or since
+    the last --from-sitemap run recorded in the DB. Returns (urls, state_key, now).
+    """
+    key = f"sitemap-last-run:{base}"
+    started = datetime.now(timezone.utc).isoformat()
+    cutoff = parse_lastmod(since or store.get_state(key))
+    if since and cutoff is None:
+        raise click.BadParameter(f"not an ISO date: {since}", param_hint="--since")
+    urls = [u for u, _ in iter_sitemap_urls(fetch_sitemaps(base), since=cutoff) if keep(u)]
+    label = cutoff.isoformat() if cutoff else "ever"
+    console.print(f"Sitemap: {len(urls)} listing page(s) changed since {label}")
+    return urls, key, started
+
+
 @app.command("scrape-quotes")
 @click.option("--max-pages", default=3, show_default=True, type=int)
 @click.option("--db", default="data/quotes.db", show_default=True, type=str)
 @click.option("--delay", default=0.5, show_default=True, type=float)
 @click.option("--concurrency", default=5, show_default=True, type=int)
 @click.option("--ignore-robots", is_flag=True)
-def scrape_quotes(max_pages: int, db: str, delay: float, concurrency: int, ignore_robots: bool):
-    """Fetch N pages, parse, and store in SQLite."""
+@click.option("--from-sitemap", is_flag=True, help="Seed pages from the site's sitemaps")
+@click.option("--since", default=None, help="With --from-sitemap: ISO date (default: last run)")
+def scrape_quotes(
+    max_pages: int,
+    db: str,
+    delay: float,
+    concurrency: int,
+    ignore_robots: bool,
+    from_sitemap: bool,
+    since: str | None,
+):
+    """Fetch N pages (or the pages changed per the sitemap), parse, and store in SQLite."""
     store = SqliteStore(db)
     inserted_before = store.count()
     total_parsed = 0
 
     disallows = [] if ignore_robots else fetch_disallows(BASE)
-    urls = [page_url(p) for p in range(1, max_pages + 1)]
+    if from_sitemap:
+        urls, state_key, started = _sitemap_seed(store, BASE, since, is_listing_url)
+    else:
+        urls = [page_url(p) for p in range(1, max_pages + 1)]
     if not ignore_robots:
         urls = [u for u in urls if is_allowed(u, disallows)]
 
     # Fetch concurrently
-    results = asyncio.run(fetch_many(urls, concurrency=concurrency, delay=delay))
+    failures: Dict[str, tuple[str, int]] = {}
+    results = asyncio.run(fetch_many(urls, concurrency=concurrency, delay=delay, failures=failures))
 
     try:
         for u in urls:
@@ -80,7 +116,11 @@ def scrape_quotes(max_pages: int, db: str, delay: float, concurrency: int, ignor
             total_parsed += len(rows)
             store.insert_quotes(rows)
             console.print(f"{u} -> parsed {len(rows)}")
+        if from_sitemap:
+            store.set_state(state_key, started)
     finally:
+        _dead_letter(store, "quotes", failures)
+        store.clear_failed(u for u in urls if results.get(u, (0, ""))[0] == 200)
         inserted_after = store.count()
         delta = inserted_after - inserted_before
         console.print(
@@ -157,33 +197,218 @@ def parse_books_cmd(page: int):
 @click.option("--delay", default=0.5, show_default=True, type=float)
 @click.option("--concurrency", default=5, show_default=True, type=int)
 @click.option("--ignore-robots", is_flag=True)
-def scrape_books(max_pages: int, db: str, delay: float, concurrency: int, ignore_robots: bool):
-    """Scrape book listings and store them."""
+@click.option("--details", is_flag=True, help="Also fetch each book's product page")
+@click.option("--detail-concurrency", default=5, show_default=True, type=int)
+@click.option(
+    "--max-age-hours",
+    default=24.0,
+    show_default=True,
+    type=float,
+    help="Re-fetch stored details older than this",
+)
+@click.option("--from-sitemap", is_flag=True, help="Seed pages from the site's sitemaps")
+@click.option("--since", default=None, help="With --from-sitemap: ISO date (default: last run)")
+def scrape_books(
+    max_pages: int,
+    db: str,
+    delay: float,
+    concurrency: int,
+    ignore_robots: bool,
+    details: bool,
+    detail_concurrency: int,
+    max_age_hours: float,
+    from_sitemap: bool,
+    since: str | None,
+):
+    """Scrape book listings (and optionally product pages) and store them."""
     store = SqliteStore(db)
     before = store.count_books()
+    details_before = store.count_book_details()
     total_parsed = 0
+    details_parsed = 0
+    fetched_ok: List[str] = []
 
     disallows = [] if ignore_robots else fetch_disallows(books_spider.BASE)
-    urls = [books_spider.page_url(p) for p in range(1, max_pages + 1)]
+    if from_sitemap:
+        urls, state_key, started = _sitemap_seed(
+            store, books_spider.BASE, since, books_spider.is_listing_url
+        )
+    else:
+        urls = [books_spider.page_url(p) for p in range(1, max_pages + 1)]
     if not ignore_robots:
         urls = [u for u in urls if is_allowed(u, disallows)]
 
-    results = asyncio.run(fetch_many(urls, concurrency=concurrency, delay=delay))
+    def on_listing(u: str, status: int, html: str) -> List[str]:
+        # Runs as each listing page lands, so its detail pages can start right away
+        nonlocal total_parsed
+        if status != 200 or not html:
+            console.print(f"[red]HTTP {status}[/] {u}")
+            return []
+        rows = books_spider.parse_books(html, u)
+        total_parsed += len(rows)
+        store.insert_books(rows)
+        fetched_ok.append(u)
+        console.print(f"{u} -> parsed {len(rows)}")
+        if not details:
+            return []
+        product_urls = [r["product_url"] for r in rows]
+        if not ignore_robots:
+            product_urls = [p for p in product_urls if is_allowed(p, disallows)]
+        return store.stale_detail_urls(product_urls, max_age=max_age_hours * 3600)
+
+    def on_detail(u: str, status: int, html: str) -> None:
+        # Store each product page as it lands, so an interrupted run keeps what it fetched
+        nonlocal details_parsed
+        if status != 200 or not html:
+            console.print(f"[red]HTTP {status}[/] {u}")
+            return
+        store.upsert_book_details([books_spider.parse_book_detail(html, u)])
+        details_parsed += 1
+        fetched_ok.append(u)
+
+    failures: Dict[str, tuple[str, int]] = {}
+    try:
+        asyncio.run(
+            fetch_fanout(
+                urls,
+                on_listing,
+                concurrency=concurrency,
+                detail_concurrency=detail_concurrency,
+                delay=delay,
+                failures=failures,
+                on_detail=on_detail,
+            )
+        )
+        if from_sitemap:
+            store.set_state(state_key, started)
+    finally:
+        _dead_letter(store, "book-listing", {u: f for u, f in failures.items() if u in urls})
+        _dead_letter(store, "book-detail", {u: f for u, f in failures.items() if u not in urls})
+        store.clear_failed(fetched_ok)
+        after = store.count_books()
+        console.print(
+            f"[bold green]Done[/]. Parsed {total_parsed} rows. Inserted {after - before} new rows. Total books: {after}"
+        )
+        if details:
+            console.print(
+                f"Details: parsed {details_parsed}. "
+                f"New {store.count_book_details() - details_before}. "
+                f"Total details: {store.count_book_details()}"
+            )
+        store.close()
+
+
+@app.command("sitemap")
+@click.option("--base", default=BASE, show_default=True, help="Site whose robots.txt to read")
+@click.option("--since", default=None, help="Only URLs with lastmod on/after this ISO date")
+@click.option("--out", default=None, help="Write all URLs to this file (one per line)")
+def sitemap(base: str, since: str | None, out: str | None):
+    """List URLs from a site's sitemaps (following sitemap indexes)."""
+    cutoff = parse_lastmod(since)
+    if since and cutoff is None:
+        raise click.BadParameter(f"not an ISO date: {since}", param_hint="--since")
+    sitemaps = fetch_sitemaps(base)
+    console.print(f"[bold]Sitemaps[/]: {', '.join(sitemaps)}")
+    n = 0
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") if out else nullcontext() as f:
+        for loc, lastmod in iter_sitemap_urls(sitemaps, since=cutoff):
+            n += 1
+            if f:
+                f.write(loc + "\n")
+            elif n <= 20:
+                console.print(f"- {loc}" + (f" ({lastmod.date()})" if lastmod else ""))
+    console.print(f"[bold green]Found[/] {n} URLs" + (f", written to {out}" if out else ""))
+
+
+def _dead_letter(store: SqliteStore, kind: str, failures: Dict[str, tuple[str, int]]) -> None:
+    if not failures:
+        return
+    store.record_failures(kind, failures)
+    console.print(
+        f"[yellow]{len(failures)} URL(s) added to the retry queue[/] (run `webharvest retry-failed`)"
+    )
+
+
+def _store_page(store: SqliteStore, kind: str, url: str, html: str) -> int:
+    """Parse a fetched page according to its dead-letter kind and store it."""
+    if kind == "quotes":
+        rows = parse_quotes(html, url)
+        store.insert_quotes(rows)
+    elif kind == "book-listing":
+        rows = books_spider.parse_books(html, url)
+        store.insert_books(rows)
+    elif kind == "book-detail":
+        rows = [books_spider.parse_book_detail(html, url)]
+        store.upsert_book_details(rows)
+    else:
+        raise ValueError(f"unknown page kind: {kind}")
+    return len(rows)
+
+
+@app.command("retry-failed")
+@click.option("--db", default="data/quotes.db", show_default=True, type=str)
+@click.option("--concurrency", default=20, show_default=True, type=int)
+@click.option("--delay", default=0.0, show_default=True, type=float)
+def retry_failed(db: str, concurrency: int, delay: float):
+    """Re-fetch URLs from the retry queue for hosts that are reachable again."""
+    store = SqliteStore(db)
+    pending = store.failed_urls()
+    if not pending:
+        console.print("[green]Retry queue is empty.[/]")
+        store.close()
+        return
+
+    by_host: Dict[str, List[Dict]] = {}
+    for row in pending:
+        by_host.setdefault(urlparse(row["url"]).netloc, []).append(row)
+
+    kinds = {row["url"]: row["kind"] for row in pending}
+    breaker = CircuitBreaker()
+    failures: Dict[str, tuple[str, int]] = {}
+    results: Dict[str, tuple[int, str]] = {}
+
+    # Probe each host with one URL first; only drain hosts that answer.
+    probes = [rows[0]["url"] for rows in by_host.values()]
+    results.update(asyncio.run(fetch_many(probes, tries=1, breaker=breaker, failures=failures)))
+    drain = [
+        row["url"]
+        for rows in by_host.values()
+        if results[rows[0]["url"]][0] != 0
+        for row in rows[1:]
+    ]
+    for host, rows in by_host.items():
+        if results[rows[0]["url"]][0] == 0:
+            console.print(f"[red]{host} still failing[/] ({len(rows)} URL(s) kept)")
+    if drain:
+        results.update(
+            asyncio.run(
+                fetch_many(
+                    drain, concurrency=concurrency, delay=delay, breaker=breaker, failures=failures
+                )
+            )
+        )
 
+    recovered: List[str] = []
     try:
-        for u in urls:
-            status, html = results.get(u, (0, ""))
+        for u, (status, html) in results.items():
+            if status == 0:
+                continue
+            # A non-retryable answer (e.g. 404) won't improve by retrying; drop it
+            recovered.append(u)
             if status != 200 or not html:
-                console.print(f"[red]HTTP {status}[/] {u}")
+                console.print(f"[red]HTTP {status}[/] {u} (dropped)")
                 continue
-            rows = books_spider.parse_books(html, u)
-            total_parsed += len(rows)
-            store.insert_books(rows)
-            console.print(f"{u} -> parsed {len(rows)}")
+            n = _store_page(store, kinds[u], u, html)
+            console.print(f"{u} -> parsed {n}")
     finally:
-        after = store.count_books()
+        store.clear_failed(recovered)
+        for kind in set(kinds.values()):
+            store.record_failures(kind, {u: f for u, f in failures.items() if kinds[u] == kind})
         console.print(
-            f"[bold green]Done[/]. Parsed {total_parsed} rows. Inserted {after - before} new rows. Total books: {after}"
+            f"[bold green]Done[/]. Recovered {len(recovered)}/{len(pending)}. "
+            f"Still queued: {store.count_failed()}"
         )
         store.close()
 
@@ -1,12 +1,122 @@
 import asyncio
+import random
+import time
+from contextlib import nullcontext
 import httpx
-from typing import Sequence, Dict, Tuple
+from typing import Callable, Iterable, Optional, Sequence, Dict, Tuple
+from urllib.parse import urlparse
 
 DEFAULT_HEADERS = {
     "User-Agent": "webharvest/0.1 ",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
 }
 
+# url -> (reason, attempts) for URLs that a bulk fetch gave up on
+Failures = Dict[str, Tuple[str, int]]
+
+
+def _jitter(delay: float) -> float:
+    """'Full jitter': sleep a random fraction of the delay so workers don't retry in lockstep."""
+    return random.uniform(0, delay)
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker shared by the workers of a bulk fetch.
+    - closed: requests go through; `threshold` URLs in a row that used up all
+      their retries open it
+    - open: workers wait out a jittered cooldown, then one probe is let through
+      (half-open) while the rest wait for its result
+    - probe succeeds: the circuit closes and the waiting workers carry on
+    - probe fails: the circuit re-opens with a doubled cooldown (capped at
+      max_cooldown) and, until that cooldown passes, requests to the host fail
+      fast instead of waiting
+    """
+
+    def __init__(
+        self,
+        threshold: int = 5,
+        cooldown: float = 5.0,
+        max_cooldown: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        # host -> {"failures": int, "open_until": float | None, "cooldown": float,
+        #          "probing": bool, "down": bool, "probe_done": asyncio.Event | None,
+        #          "probe_task": asyncio.Task | None}
+        self._hosts: Dict[str, Dict] = {}
+
+    def _state(self, url: str) -> Dict:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = {
+                "failures": 0,
+                "open_until": None,
+                "cooldown": self.cooldown,
+                "probing": False,
+                "down": False,  # a probe has confirmed the host is still failing
+                "probe_done": None,
+                "probe_task": None,
+            }
+        return self._hosts[host]
+
+    def is_open(self, url: str) -> bool:
+        return self._state(url)["open_until"] is not None
+
+    def is_probing(self, url: str) -> bool:
+        return self._state(url)["probing"]
+
+    def ready(self, url: str) -> bool:
+        """True if the current task may send to url's host right now (closed, or it is the probe)."""
+        st = self._state(url)
+        return st["open_until"] is None or st["probe_task"] is asyncio.current_task()
+
+    async def acquire(self, url: str) -> bool:
+        """
+        Wait until a request to url's host may be sent. Returns False (fail fast)
+        when a probe has just confirmed that the host is still down.
+        """
+        st = self._state(url)
+        while st["open_until"] is not None:
+            if st["probing"]:
+                await st["probe_done"].wait()
+                continue
+            wait = st["open_until"] - self.clock()
+            if wait <= 0:
+                # created here so the event belongs to the running loop
+                st["probing"], st["probe_done"] = True, asyncio.Event()
+                st["probe_task"] = asyncio.current_task()
+                return True  # this caller is the probe
+            if st["down"]:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+    def _end_probe(self, st: Dict) -> None:
+        if st["probe_done"] is not None:
+            st["probe_done"].set()
+        st["probing"], st["probe_done"], st["probe_task"] = False, None, None
+
+    def record_success(self, url: str) -> None:
+        st = self._state(url)
+        self._end_probe(st)
+        st.update(failures=0, open_until=None, cooldown=self.cooldown, down=False)
+
+    def record_failure(self, url: str) -> None:
+        """Count one failed URL (or a failed probe attempt)."""
+        st = self._state(url)
+        st["failures"] += 1
+        if st["probing"]:
+            st["cooldown"] = min(st["cooldown"] * 2, self.max_cooldown)
+            st["down"] = True
+        elif st["open_until"] is not None or st["failures"] < self.threshold:
+            return
+        st["open_until"] = self.clock() + random.uniform(st["cooldown"] / 2, st["cooldown"])
+        self._end_probe(st)
+
 
 async def fetch_text_retry(url: str, tries: int = 3, backoff: float = 1.6) -> tuple[int, str]:
     """
@@ -28,28 +138,80 @@ async def fetch_text_retry(url: str, tries: int = 3, backoff: float = 1.6) -> tu
                 last_exc = exc
                 if attempt == tries:
                     raise
-                await asyncio.sleep(delay)
+                await asyncio.sleep(_jitter(delay))
                 delay *= backoff
     # Should never reach here, but keeps type checkers happy
     raise RuntimeError(f"Failed to fetch {url}") from last_exc
 
 
+async def _send(
+    client: httpx.AsyncClient,
+    url: str,
+    breaker: Optional[CircuitBreaker],
+    slot: Optional[asyncio.Semaphore],
+    pause: float,
+) -> Optional[httpx.Response]:
+    """
+    Send one GET, holding a concurrency slot only while the request is in flight:
+    waiting out an open circuit happens outside the slot, so one unhealthy host
+    can't starve the others. Returns None if the breaker refuses the host.
+    """
+    while True:
+        if breaker and not await breaker.acquire(url):
+            return None
+        async with slot or nullcontext():
+            # the circuit may have opened while we queued for the slot
+            if breaker is None or breaker.ready(url):
+                if pause:
+                    await asyncio.sleep(pause)
+                return await client.get(url)
+
+
 async def _fetch_with_client(
-    client: httpx.AsyncClient, url: str, tries: int = 3, backoff: float = 1.6
+    client: httpx.AsyncClient,
+    url: str,
+    tries: int = 3,
+    backoff: float = 1.6,
+    breaker: Optional[CircuitBreaker] = None,
+    failures: Optional[Failures] = None,
+    slot: Optional[asyncio.Semaphore] = None,
+    pause: float = 0.0,
 ) -> Tuple[int, str]:
     delay = 0.5
+    reason = ""
+    attempts = 0
+    exhausted = True
     for attempt in range(1, tries + 1):
         try:
-            r = await client.get(url)
-            if r.status_code in (429, 500, 502, 503, 504):
-                raise httpx.HTTPStatusError("server busy", request=r.request, response=r)
-            return r.status_code, r.text
-        except Exception:
-            if attempt == tries:
-                # For bulk mode we don't raise; return a sentinel instead
-                return 0, ""
-            await asyncio.sleep(delay)
-            delay *= backoff
+            # the politeness pause applies once per URL, not per retry
+            r = await _send(client, url, breaker, slot, pause if attempt == 1 else 0.0)
+        except Exception as exc:
+            attempts += 1
+            reason = f"{type(exc).__name__}: {exc}".rstrip(": ")
+        else:
+            if r is None:
+                # keep the last real error if this URL already made an attempt
+                reason, exhausted = reason or "circuit open", False
+                break
+            attempts += 1
+            if r.status_code not in (429, 500, 502, 503, 504):
+                if breaker:
+                    breaker.record_success(url)
+                return r.status_code, r.text
+            reason = f"HTTP {r.status_code}"
+        if attempt == tries:
+            break
+        if breaker and breaker.is_probing(url):
+            # a probe gets a single attempt so waiting workers aren't held up
+            breaker.record_failure(url)
+        await asyncio.sleep(_jitter(delay))
+        delay *= backoff
+    # The breaker counts URLs, not attempts: only a URL whose retries all failed
+    if breaker and exhausted:
+        breaker.record_failure(url)
+    # For bulk mode we don't raise; record why and return a sentinel instead
+    if failures is not None:
+        failures[url] = (reason, attempts)
     return 0, ""
 
 
@@ -59,13 +221,19 @@ async def fetch_many(
     backoff: float = 1.6,
     concurrency: int = 5,
     delay: float = 0.0,
+    breaker: Optional[CircuitBreaker] = None,
+    failures: Optional[Failures] = None,
 ) -> Dict[str, Tuple[int, str]]:
     """
     Fetch many URLs concurrently with a shared client.
-    - concurrency: max in-flight requests
-    - delay: optional per-request pause inside each worker
+    - concurrency: max in-flight requests (workers waiting on an open circuit
+      don't take up a slot)
+    - delay: optional pause before each URL's request, inside its slot
+    - breaker: per-host circuit breaker (a fresh one is used if not given)
+    - failures: if given, filled with {url: (reason, attempts)} for URLs that failed
     Returns: {url: (status, text)}
     """
+    breaker = breaker or CircuitBreaker()
     results: Dict[str, Tuple[int, str]] = {}
     sem = asyncio.Semaphore(max(1, concurrency))
     async with httpx.AsyncClient(
@@ -73,11 +241,91 @@ async def fetch_many(
     ) as client:
 
         async def worker(u: str):
-            async with sem:
-                if delay:
-                    await asyncio.sleep(delay)
-                status, text = await _fetch_with_client(client, u, tries=tries, backoff=backoff)
-                results[u] = (status, text)
+            results[u] = await _fetch_with_client(
+                client,
+                u,
+                tries=tries,
+                backoff=backoff,
+                breaker=breaker,
+                failures=failures,
+                slot=sem,
+                pause=delay,
+            )
 
         await asyncio.gather(*(worker(u) for u in urls))
     return results
+
+
+async def fetch_fanout(
+    urls: Sequence[str],
+    expand: Callable[[str, int, str], Iterable[str]],
+    tries: int = 3,
+    backoff: float = 1.6,
+    concurrency: int = 5,
+    detail_concurrency: int = 5,
+    delay: float = 0.0,
+    breaker: Optional[CircuitBreaker] = None,
+    failures: Optional[Failures] = None,
+    on_detail: Optional[Callable[[str, int, str], None]] = None,
+) -> Tuple[Dict[str, Tuple[int, str]], Dict[str, Tuple[int, str]]]:
+    """
+    Fetch listing pages and fan out to the detail pages they link to.
+    - expand(url, status, text) is called as soon as each listing page is done
+      and returns the detail URLs to fetch (duplicates are fetched once)
+    - detail fetches start immediately, pipelined with the remaining listings
+    - concurrency / detail_concurrency: separate in-flight budgets for the two
+      stages, sharing one client (and connection pool)
+    - on_detail(url, status, text): if given, called as each detail page lands;
+      its text is then not kept (the detail result is (status, ""))
+    - breaker / failures: as in fetch_many, shared by both stages
+    Returns: ({listing_url: (status, text)}, {detail_url: (status, text)})
+    """
+    breaker = breaker or CircuitBreaker()
+    listings: Dict[str, Tuple[int, str]] = {}
+    details: Dict[str, Tuple[int, str]] = {}
+    listing_sem = asyncio.Semaphore(max(1, concurrency))
+    detail_sem = asyncio.Semaphore(max(1, detail_concurrency))
+    scheduled: set[str] = set()
+    detail_tasks: list[asyncio.Task] = []
+    limits = httpx.Limits(max_connections=max(1, concurrency) + max(1, detail_concurrency))
+    async with httpx.AsyncClient(
+        headers=DEFAULT_HEADERS, http2=True, follow_redirects=True, timeout=15.0, limits=limits
+    ) as client:
+
+        async def detail_worker(u: str):
+            status, text = await _fetch_with_client(
+                client,
+                u,
+                tries=tries,
+                backoff=backoff,
+                breaker=breaker,
+                failures=failures,
+                slot=detail_sem,
+                pause=delay,
+            )
+            if on_detail:
+                on_detail(u, status, text)
+                text = ""
+            details[u] = (status, text)
+
+        async def listing_worker(u: str):
+            status, text = await _fetch_with_client(
+                client,
+                u,
+                tries=tries,
+                backoff=backoff,
+                breaker=breaker,
+                failures=failures,
+                slot=listing_sem,
+                pause=delay,
+            )
+            listings[u] = (status, text)
+            for d in expand(u, status, text):
+                if d not in scheduled:
+                    scheduled.add(d)
+                    detail_tasks.append(asyncio.create_task(detail_worker(d)))
+
+        await asyncio.gather(*(listing_worker(u) for u in urls))
+        # every listing has been expanded by now, so the task list is final
+        await asyncio.gather(*detail_tasks)
+    return listings, details
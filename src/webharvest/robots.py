@@ -8,22 +8,30 @@ def robots_url(base: str) -> str:
     return urljoin(origin, "/robots.txt")
 
 
-def fetch_disallows(base: str, user_agent: str = "*") -> list[str]:
-    """
-    Parse a very small subset of robots.txt for User-agent: * Disallow: rules.
-    Good enough for demos; use a real parser for production.
-    """
+def _fetch_robots(base: str) -> str:
+    """Return robots.txt text for base's origin ('' if missing or unreachable)."""
     url = robots_url(base)
     try:
         r = httpx.get(url, timeout=10.0, follow_redirects=True)
         if r.status_code != 200:
-            return []
+            return ""
     except Exception:
-        return []
+        return ""
+    return r.text
+
+
+def fetch_disallows(base: str, user_agent: str = "*") -> list[str]:
+    """
+    Parse a very small subset of robots.txt for User-agent: * Disallow: rules.
+    Good enough for demos; use a real parser for production.
+    """
+    return parse_disallows(_fetch_robots(base), user_agent)
 
+
+def parse_disallows(text: str, user_agent: str = "*") -> list[str]:
     disallows: list[str] = []
     ua_block = False
-    for raw in r.text.splitlines():
+    for raw in text.splitlines():
         line = raw.strip()
         if not line or line.startswith("#"):
             continue
@@ -37,6 +45,24 @@ def fetch_disallows(base: str, user_agent: str = "*") -> list[str]:
     return disallows
 
 
+def fetch_sitemaps(base: str) -> list[str]:
+    """Sitemap URLs listed in robots.txt (falls back to /sitemap.xml if none)."""
+    return parse_sitemaps(_fetch_robots(base), base) or [urljoin(robots_url(base), "/sitemap.xml")]
+
+
+def parse_sitemaps(text: str, base: str) -> list[str]:
+    # Sitemap: lines apply to every user-agent, so no block tracking here
+    sitemaps: list[str] = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.lower().startswith("sitemap:"):
+            raw_url = line.split(":", 1)[1].strip()
+            url = urljoin(base, raw_url) if raw_url else ""
+            if url and url not in sitemaps:
+                sitemaps.append(url)
+    return sitemaps
+
+
 def is_allowed(url: str, disallows: list[str]) -> bool:
     path = urlparse(url).path or "/"
     for rule in disallows:
@@ -0,0 +1,123 @@
+import zlib
+from datetime import datetime, time, timezone
+from typing import Iterable, Iterator, Optional, Tuple
+
+import httpx
+from lxml import etree
+
+from .http import DEFAULT_HEADERS
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def parse_lastmod(text: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a W3C datetime ('2024-05-01', '2024-05-01T12:00:00Z', ...) as aware UTC.
+    Returns None for missing or malformed values.
+    """
+    if not text:
+        return None
+    try:
+        dt = datetime.fromisoformat(text.strip())
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def parse_sitemap_stream(
+    chunks: Iterable[bytes],
+) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+    """
+    Incrementally parse a sitemap (urlset) or sitemap index from byte chunks.
+    Gzipped input is detected from its magic bytes and inflated on the fly.
+    Yields (kind, loc, lastmod) with kind "url" or "sitemap"; elements are freed
+    as soon as they are read, so memory stays flat for huge files.
+    """
+    parser = etree.XMLPullParser(events=("end",), resolve_entities=False, no_network=True)
+    inflate = None
+    first = True
+    for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk.startswith(_GZIP_MAGIC):
+                inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parser.feed(inflate.decompress(chunk) if inflate else chunk)
+        yield from _drain(parser)
+    if inflate:
+        parser.feed(inflate.flush())
+    parser.close()
+    yield from _drain(parser)
+
+
+def _drain(parser: etree.XMLPullParser) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+    for _, el in parser.read_events():
+        kind = etree.QName(el).localname
+        if kind not in ("url", "sitemap"):
+            continue
+        loc = lastmod = None
+        for child in el:
+            name = etree.QName(child).localname
+            if name == "loc":
+                loc = (child.text or "").strip()
+            elif name == "lastmod":
+                lastmod = child.text
+        # free this entry and the already-processed siblings before it
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+        if loc:
+            yield kind, loc, parse_lastmod(lastmod)
+
+
+def _older_than(lastmod: datetime, since: datetime) -> bool:
+    """
+    True if lastmod is before since. A date-only lastmod ('2024-05-01') parses as
+    midnight but means "some time that day", so midnight values compare by day.
+    """
+    if lastmod.time() == time(0):
+        return lastmod.date() < since.astimezone(timezone.utc).date()
+    return lastmod < since
+
+
+def iter_sitemap_urls(
+    sitemap_urls: Iterable[str],
+    since: Optional[datetime] = None,
+    max_depth: int = 3,
+) -> Iterator[Tuple[str, Optional[datetime]]]:
+    """
+    Stream (loc, lastmod) page entries from sitemaps, following sitemap indexes.
+    - since: skip entries (and whole child sitemaps) whose lastmod is older
+      (date-only values by day); entries without a lastmod are always kept
+    - max_depth: how many levels of nested indexes to follow
+    Unreachable sitemaps are skipped. A broken or truncated file (bad XML or gzip)
+    is read up to the error: entries and child sitemaps before it are kept.
+    """
+    seen: set[str] = set()
+    with httpx.Client(headers=DEFAULT_HEADERS, follow_redirects=True, timeout=30.0) as client:
+
+        def walk(url: str, depth: int) -> Iterator[Tuple[str, Optional[datetime]]]:
+            if url in seen:
+                return
+            seen.add(url)
+            children = []
+            try:
+                with client.stream("GET", url) as r:
+                    if r.status_code != 200:
+                        return
+                    for kind, loc, lastmod in parse_sitemap_stream(r.iter_bytes()):
+                        if since and lastmod and _older_than(lastmod, since):
+                            continue
+                        if kind == "url":
+                            yield loc, lastmod
+                        elif depth < max_depth:
+                            children.append(loc)
+            except (httpx.HTTPError, etree.XMLSyntaxError, zlib.error):
+                pass  # keep whatever was read before the error
+            # child sitemaps are opened after the index stream is closed
+            for child in children:
+                yield from walk(child, depth + 1)
+
+        for u in sitemap_urls:
+            yield from walk(u, 0)
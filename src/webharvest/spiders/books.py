@@ -1,6 +1,7 @@
+import re
 from bs4 import BeautifulSoup
 from typing import List, Dict
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 BASE = "https://books.toscrape.com/"
 
@@ -12,6 +13,15 @@ def page_url(page: int) -> str:
     return urljoin(BASE, f"catalogue/page-{page}.html")
 
 
+_LISTING_PATH_RE = re.compile(r"^/catalogue/page-\d+\.html$")
+
+
+def is_listing_url(url: str) -> bool:
+    """True for URLs shaped like page_url() output (used to filter sitemap entries)."""
+    p = urlparse(url)
+    return p.netloc == urlparse(BASE).netloc and bool(_LISTING_PATH_RE.match(p.path))
+
+
 _RATING_MAP = {"One": 1, "Two": 2, "Three": 3, "Four": 4, "Five": 5}
 
 
@@ -65,3 +75,43 @@ def parse_books(html: str, source_url: str) -> List[Dict]:
             }
         )
     return rows
+
+
+_STOCK_COUNT_RE = re.compile(r"\((\d+)\s+available\)")
+
+
+def parse_book_detail(html: str, product_url: str) -> Dict:
+    """
+    Extract extra fields from a single product page.
+      - title:       div.product_main h1
+      - upc:         table.table-striped row 'UPC'
+      - description: the <p> right after div#product_description
+      - category:    ul.breadcrumb, the item before the book itself
+      - stock_count: 'In stock (22 available)' -> 22 (None if not shown)
+    """
+    soup = BeautifulSoup(html, "lxml")
+
+    info: Dict[str, str] = {}
+    for tr in soup.select("table.table-striped tr"):
+        th, td = tr.select_one("th"), tr.select_one("td")
+        if th and td:
+            info[th.get_text(strip=True)] = td.get_text(" ", strip=True)
+
+    title_el = soup.select_one("div.product_main h1")
+    desc_el = soup.select_one("div#product_description + p")
+
+    # breadcrumb: Home > Books > <Category> > <Title (li.active)>
+    crumbs = soup.select("ul.breadcrumb li a")
+    category = crumbs[-1].get_text(strip=True) if len(crumbs) >= 3 else None
+
+    m = _STOCK_COUNT_RE.search(info.get("Availability", ""))
+    stock_count = int(m.group(1)) if m else None
+
+    return {
+        "product_url": product_url,
+        "title": title_el.get_text(strip=True) if title_el else "",
+        "upc": info.get("UPC"),
+        "description": desc_el.get_text(strip=True) if desc_el else None,
+        "category": category,
+        "stock_count": stock_count,
+    }
@@ -1,6 +1,7 @@
+import re
 from bs4 import BeautifulSoup
 from typing import List, Dict
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 BASE = "https://quotes.toscrape.com/"
 
@@ -9,6 +10,15 @@ def page_url(page: int) -> str:
     return BASE if page <= 1 else urljoin(BASE, f"/page/{page}/")
 
 
+_LISTING_PATH_RE = re.compile(r"^/(page/\d+/?)?$")
+
+
+def is_listing_url(url: str) -> bool:
+    """True for URLs shaped like page_url() output (used to filter sitemap entries)."""
+    p = urlparse(url)
+    return p.netloc == urlparse(BASE).netloc and bool(_LISTING_PATH_RE.match(p.path or "/"))
+
+
 def parse_quotes(html: str, source_url: str) -> List[Dict]:
     """
     Extract quotes from a single page.
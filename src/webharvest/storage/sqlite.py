@@ -1,6 +1,7 @@
 from pathlib import Path
 from collections import Counter
 import sqlite3
+import time
 from typing import Iterable, Dict, List, Tuple
 
 SCHEMA = """
@@ -23,6 +24,33 @@ CREATE TABLE IF NOT EXISTS books (
   source_url TEXT NOT NULL,
   UNIQUE(title, product_url) ON CONFLICT IGNORE
 );
+
+-- One row per product page; joins to books on product_url.
+CREATE TABLE IF NOT EXISTS book_details (
+  product_url TEXT PRIMARY KEY,
+  upc TEXT,
+  description TEXT,
+  category TEXT,
+  stock_count INTEGER,
+  fetched_at REAL NOT NULL
+);
+
+-- Dead-letter queue: URLs a bulk fetch gave up on, drained by `retry-failed`.
+-- kind says how to parse the page once it is fetched (quotes, book-listing, ...).
+CREATE TABLE IF NOT EXISTS failed_urls (
+  url TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  reason TEXT NOT NULL,
+  attempts INTEGER NOT NULL,
+  first_failed_at REAL NOT NULL,
+  last_failed_at REAL NOT NULL
+);
+
+-- Small key/value store for crawl bookkeeping (e.g. last sitemap run per site).
+CREATE TABLE IF NOT EXISTS crawl_state (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
 """
 
 
@@ -103,6 +131,100 @@ class SqliteStore:
         )
         return cur.fetchall()
 
+    # ---------- BOOK DETAILS ----------
+    def upsert_book_details(self, rows: Iterable[Dict]) -> int:
+        """Insert or refresh detail rows; fetched_at is stamped now."""
+        now = time.time()
+        self.conn.executemany(
+            """INSERT OR REPLACE INTO book_details
+               (product_url, upc, description, category, stock_count, fetched_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (
+                (
+                    r["product_url"],
+                    r.get("upc"),
+                    r.get("description"),
+                    r.get("category"),
+                    r.get("stock_count"),
+                    now,
+                )
+                for r in rows
+            ),
+        )
+        self.conn.commit()
+        return self.conn.total_changes
+
+    def count_book_details(self) -> int:
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM book_details").fetchone()
+        return int(n)
+
+    def stale_detail_urls(self, urls: Iterable[str], max_age: float) -> List[str]:
+        """
+        Return the URLs (in input order, deduplicated) whose details are missing
+        or were fetched more than max_age seconds ago.
+        """
+        cutoff = time.time() - max_age
+        out: List[str] = []
+        seen: set[str] = set()
+        for u in urls:
+            if u in seen:
+                continue
+            seen.add(u)
+            row = self.conn.execute(
+                "SELECT fetched_at FROM book_details WHERE product_url = ?", (u,)
+            ).fetchone()
+            if row is None or row[0] < cutoff:
+                out.append(u)
+        return out
+
+    # ---------- DEAD LETTERS ----------
+    def record_failures(self, kind: str, failures: Dict[str, Tuple[str, int]]) -> None:
+        """Add {url: (reason, attempts)} to the dead-letter table; attempts accumulate."""
+        now = time.time()
+        self.conn.executemany(
+            """INSERT INTO failed_urls
+               (url, kind, reason, attempts, first_failed_at, last_failed_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(url) DO UPDATE SET
+                 reason = excluded.reason,
+                 attempts = attempts + excluded.attempts,
+                 last_failed_at = excluded.last_failed_at""",
+            ((u, kind, reason, attempts, now, now) for u, (reason, attempts) in failures.items()),
+        )
+        self.conn.commit()
+
+    def failed_urls(self, kind: str | None = None) -> List[Dict]:
+        """Dead-letter rows, oldest failure first."""
+        sql = "SELECT url, kind, reason, attempts FROM failed_urls"
+        params: Tuple = ()
+        if kind is not None:
+            sql += " WHERE kind = ?"
+            params = (kind,)
+        cur = self.conn.execute(sql + " ORDER BY first_failed_at, url", params)
+        return [
+            {"url": u, "kind": k, "reason": reason, "attempts": attempts}
+            for u, k, reason, attempts in cur.fetchall()
+        ]
+
+    def count_failed(self) -> int:
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM failed_urls").fetchone()
+        return int(n)
+
+    def clear_failed(self, urls: Iterable[str]) -> None:
+        self.conn.executemany("DELETE FROM failed_urls WHERE url = ?", ((u,) for u in urls))
+        self.conn.commit()
+
+    # ---------- CRAWL STATE ----------
+    def get_state(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM crawl_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO crawl_state (key, value) VALUES (?, ?)", (key, value)
+        )
+        self.conn.commit()
+
     def close(self) -> None:
         self.conn.close()
 
@@ -1,5 +1,5 @@
 from pathlib import Path
-from webharvest.spiders.books import parse_books
+from webharvest.spiders.books import is_listing_url, page_url, parse_books, parse_book_detail
 
 
 def test_parse_books_sample():
@@ -15,3 +15,21 @@ def test_parse_books_sample():
         assert first["price_gbp"] >= 0.0
     if first["rating"] is not None:
         assert 1 <= first["rating"] <= 5
+
+
+def test_parse_book_detail_sample():
+    html = Path(__file__).with_name("sample_book_detail.html").read_text(encoding="utf-8")
+    url = "https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html"
+    d = parse_book_detail(html, url)
+    assert d["product_url"] == url
+    assert d["title"] == "A Light in the Attic"
+    assert d["upc"] == "a897fe39b1053632"
+    assert d["category"] == "Poetry"
+    assert d["stock_count"] == 22
+    assert d["description"].startswith("It's hard to imagine")
+
+
+def test_is_listing_url():
+    assert is_listing_url(page_url(3))
+    assert not is_listing_url("https://books.toscrape.com/catalogue/example_1/index.html")
+    assert not is_listing_url("https://example.com/catalogue/page-2.html")
@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+
+from webharvest import http
+from webharvest.http import CircuitBreaker
+
+URL = "https://example.com/a"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_recovers():
+    clock = FakeClock()
+    b = CircuitBreaker(threshold=2, cooldown=10.0, clock=clock)
+
+    async def run():
+        b.record_failure(URL)
+        assert await b.acquire(URL)
+        b.record_failure(URL)
+        assert b.is_open(URL)
+        # other hosts are unaffected
+        assert await b.acquire("https://other.example.org/")
+
+        clock.now = 10.0  # past the (jittered, <= cooldown) wait
+        assert await b.acquire(URL) and b.is_probing(URL)
+        waiter = asyncio.create_task(b.acquire(URL))  # waits for the probe's result
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        b.record_failure(URL)
+        # a failed probe confirms the host is down: waiters and newcomers fail fast
+        assert await waiter is False
+        assert await b.acquire(URL) is False
+
+        clock.now = 40.0  # past the doubled cooldown
+        assert await b.acquire(URL)
+        b.record_success(URL)
+        assert not b.is_open(URL)
+        assert await b.acquire(URL)
+
+    asyncio.run(run())
+
+
+def _mock_client(monkeypatch, handler):
+    real_client = httpx.AsyncClient
+
+    def client(**kwargs):
+        kwargs.pop("http2", None)
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(http, "_jitter", lambda delay: 0)
+    monkeypatch.setattr(httpx, "AsyncClient", client)
+
+
+def test_fetch_many_recovers_from_short_429_burst(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        return httpx.Response(429 if len(calls) <= 5 else 200, text="ok")
+
+    _mock_client(monkeypatch, handler)
+    urls = [f"https://example.com/{i}" for i in range(20)]
+    failures = {}
+    results = asyncio.run(http.fetch_many(urls, concurrency=5, failures=failures))
+    assert all(status == 200 for status, _ in results.values())
+    assert failures == {}
+    assert len(calls) == 25
+
+
+def test_fetch_many_waits_for_probe_after_outage(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        return httpx.Response(503 if len(calls) <= 6 else 200, text="ok")
+
+    _mock_client(monkeypatch, handler)
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    breaker = CircuitBreaker(threshold=2, cooldown=0.01)
+    failures = {}
+    results = asyncio.run(http.fetch_many(urls, concurrency=1, breaker=breaker, failures=failures))
+    # the first two URLs use up their retries and open the circuit; the rest
+    # wait for the cooldown, the probe succeeds and everything else goes through
+    assert failures == {urls[0]: ("HTTP 503", 3), urls[1]: ("HTTP 503", 3)}
+    assert all(results[u][0] == 200 for u in urls[2:])
+    assert not breaker.is_open(urls[0])
+
+
+def test_fetch_fails_fast_once_probe_fails(monkeypatch):
+    calls = []
+    breaker = CircuitBreaker(threshold=2, cooldown=0.01)
+
+    def handler(request):
+        calls.append(str(request.url))
+        if len(calls) == 7:
+            # freeze time at the probe so the re-opened circuit stays open
+            now = breaker.clock()
+            breaker.clock = lambda: now
+        return httpx.Response(503)
+
+    _mock_client(monkeypatch, handler)
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    failures = {}
+    asyncio.run(http.fetch_many(urls, concurrency=1, breaker=breaker, failures=failures))
+    # 2 URLs x 3 tries open the circuit, then a single probe attempt fails
+    assert len(calls) == 7
+    assert failures[urls[2]] == ("HTTP 503", 1)
+    assert all(failures[u] == ("circuit open", 0) for u in urls[3:])
@@ -0,0 +1,47 @@
+import asyncio
+
+from webharvest import http
+
+
+def test_fetch_fanout_pipelines_details(monkeypatch):
+    order = []
+
+    async def fake_fetch(client, url, **kwargs):
+        order.append(url)
+        # page-2 is slow, so page-1's details should start before it finishes
+        if url == "page-2":
+            await asyncio.sleep(0.05)
+            order.append("page-2 done")
+        return 200, url
+
+    monkeypatch.setattr(http, "_fetch_with_client", fake_fetch)
+
+    def expand(url, status, text):
+        return [f"{url}/a", f"{url}/b", "shared"]
+
+    listings, details = asyncio.run(
+        http.fetch_fanout(["page-1", "page-2"], expand, concurrency=2, detail_concurrency=2)
+    )
+    assert set(listings) == {"page-1", "page-2"}
+    assert set(details) == {"page-1/a", "page-1/b", "page-2/a", "page-2/b", "shared"}
+    assert order.count("shared") == 1
+    assert order.index("page-1/a") < order.index("page-2 done")
+
+
+def test_fetch_fanout_on_detail_streams_results(monkeypatch):
+    async def fake_fetch(client, url, **kwargs):
+        return 200, f"<html>{url}</html>"
+
+    monkeypatch.setattr(http, "_fetch_with_client", fake_fetch)
+    seen = {}
+
+    listings, details = asyncio.run(
+        http.fetch_fanout(
+            ["page-1"],
+            lambda url, status, text: ["page-1/a"],
+            on_detail=lambda url, status, text: seen.update({url: text}),
+        )
+    )
+    assert seen == {"page-1/a": "<html>page-1/a</html>"}
+    # the callback consumed the body, so it isn't kept around
+    assert details == {"page-1/a": (200, "")}
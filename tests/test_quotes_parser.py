@@ -1,5 +1,5 @@
 from pathlib import Path
-from webharvest.spiders.quotes import parse_quotes
+from webharvest.spiders.quotes import is_listing_url, page_url, parse_quotes
 
 
 def test_parse_quotes_sample():
@@ -9,3 +9,8 @@ def test_parse_quotes_sample():
     first = rows[0]
     assert {"text", "author", "tags", "source_url"} <= set(first.keys())
     assert isinstance(first["tags"], list)
+
+
+def test_is_listing_url():
+    assert is_listing_url(page_url(1)) and is_listing_url(page_url(5))
+    assert not is_listing_url("https://quotes.toscrape.com/author/Albert-Einstein/")
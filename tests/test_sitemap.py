@@ -0,0 +1,113 @@
+import gzip
+from datetime import datetime, timezone
+
+import httpx
+
+from webharvest.robots import parse_disallows, parse_sitemaps
+from webharvest.sitemap import iter_sitemap_urls, parse_lastmod, parse_sitemap_stream
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://quotes.toscrape.com/page/2/</loc><lastmod>2024-05-01</lastmod></url>
+  <url><loc> https://quotes.toscrape.com/page/3/ </loc></url>
+  <url><lastmod>2024-05-01</lastmod></url>
+</urlset>"""
+
+INDEX = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/a.xml.gz</loc><lastmod>2024-05-01T10:00:00Z</lastmod></sitemap>
+</sitemapindex>"""
+
+
+def _chunks(data: bytes, size: int = 7):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+def test_parse_urlset_in_small_chunks():
+    rows = list(parse_sitemap_stream(_chunks(URLSET)))
+    assert rows == [
+        (
+            "url",
+            "https://quotes.toscrape.com/page/2/",
+            datetime(2024, 5, 1, tzinfo=timezone.utc),
+        ),
+        ("url", "https://quotes.toscrape.com/page/3/", None),
+    ]
+
+
+def test_parse_gzipped_index():
+    rows = list(parse_sitemap_stream(_chunks(gzip.compress(INDEX))))
+    assert rows == [
+        (
+            "sitemap",
+            "https://example.com/a.xml.gz",
+            datetime(2024, 5, 1, 10, tzinfo=timezone.utc),
+        )
+    ]
+
+
+def test_parse_lastmod():
+    assert parse_lastmod("2024-05-01T12:00:00+02:00") == datetime(
+        2024, 5, 1, 10, tzinfo=timezone.utc
+    )
+    assert parse_lastmod("not a date") is None
+    assert parse_lastmod(None) is None
+
+
+def test_robots_sitemap_lines():
+    text = """
+User-agent: *
+Disallow: /admin
+Sitemap: https://example.com/sitemap.xml
+sitemap: /news.xml.gz
+"""
+    assert parse_sitemaps(text, "https://example.com/") == [
+        "https://example.com/sitemap.xml",
+        "https://example.com/news.xml.gz",
+    ]
+    assert parse_disallows(text) == ["/admin"]
+
+
+def _serve(monkeypatch, pages):
+    real_client = httpx.Client
+
+    def handler(request):
+        body = pages.get(str(request.url))
+        return httpx.Response(200, content=body) if body is not None else httpx.Response(404)
+
+    monkeypatch.setattr(
+        httpx, "Client", lambda **kw: real_client(transport=httpx.MockTransport(handler), **kw)
+    )
+
+
+def test_date_only_lastmod_compares_by_day(monkeypatch):
+    urlset = b"""<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+      <url><loc>https://example.com/same-day</loc><lastmod>2024-05-01</lastmod></url>
+      <url><loc>https://example.com/day-before</loc><lastmod>2024-04-30</lastmod></url>
+      <url><loc>https://example.com/earlier</loc><lastmod>2024-05-01T09:00:00Z</lastmod></url>
+    </urlset>"""
+    _serve(monkeypatch, {"https://example.com/sitemap.xml": urlset})
+    since = datetime(2024, 5, 1, 10, tzinfo=timezone.utc)  # the last run's start
+    locs = [loc for loc, _ in iter_sitemap_urls(["https://example.com/sitemap.xml"], since)]
+    assert locs == ["https://example.com/same-day"]
+
+
+def test_corrupt_gzip_is_skipped(monkeypatch):
+    bad = bytearray(gzip.compress(URLSET * 50))
+    bad[40:60] = bytes(b ^ 0xFF for b in bad[40:60])  # corrupt the deflate stream
+    _serve(monkeypatch, {"https://example.com/bad.xml.gz": bytes(bad)})
+    assert list(iter_sitemap_urls(["https://example.com/bad.xml.gz"])) == []
+
+
+def test_truncated_index_still_follows_earlier_children(monkeypatch):
+    index = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+      <sitemap><loc>https://example.com/good.xml</loc></sitemap>
+      <sitemap><loc>https://example.com/lost"""
+    _serve(
+        monkeypatch,
+        {"https://example.com/index.xml": index, "https://example.com/good.xml": URLSET},
+    )
+    locs = [loc for loc, _ in iter_sitemap_urls(["https://example.com/index.xml"])]
+    assert locs == [
+        "https://quotes.toscrape.com/page/2/",
+        "https://quotes.toscrape.com/page/3/",
+    ]
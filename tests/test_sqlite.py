@@ -30,3 +30,12 @@ def test_sqlite_roundtrip(tmp_path):
     )
     assert s.count() == before + 1
     s.close()
+
+
+def test_crawl_state(tmp_path):
+    s = SqliteStore(str(tmp_path / "t.db"))
+    assert s.get_state("sitemap-last-run:x") is None
+    s.set_state("sitemap-last-run:x", "2024-05-01T00:00:00+00:00")
+    s.set_state("sitemap-last-run:x", "2024-06-01T00:00:00+00:00")
+    assert s.get_state("sitemap-last-run:x") == "2024-06-01T00:00:00+00:00"
+    s.close()
@@ -0,0 +1,23 @@
+from webharvest.storage.sqlite import SqliteStore
+
+URL = "https://books.toscrape.com/catalogue/example_1/index.html"
+
+
+def test_book_details_upsert_and_freshness(tmp_path):
+    s = SqliteStore(str(tmp_path / "t.db"))
+    other = "https://books.toscrape.com/catalogue/other_2/index.html"
+    assert s.stale_detail_urls([URL, other, URL], max_age=3600) == [URL, other]
+
+    row = {"product_url": URL, "upc": "abc", "description": "d", "category": "Poetry"}
+    s.upsert_book_details([{**row, "stock_count": 3}])
+    assert s.count_book_details() == 1
+    # fresh rows are skipped; a negative max-age treats everything as stale
+    assert s.stale_detail_urls([URL, other], max_age=3600) == [other]
+    assert s.stale_detail_urls([URL], max_age=-1) == [URL]
+
+    # refreshing replaces the row instead of duplicating it
+    s.upsert_book_details([{**row, "stock_count": 7}])
+    assert s.count_book_details() == 1
+    (n,) = s.conn.execute("SELECT stock_count FROM book_details").fetchone()
+    assert n == 7
+    s.close()
@@ -0,0 +1,19 @@
+from webharvest.storage.sqlite import SqliteStore
+
+URL = "https://quotes.toscrape.com/page/3/"
+
+
+def test_failed_urls_roundtrip(tmp_path):
+    s = SqliteStore(str(tmp_path / "t.db"))
+    s.record_failures("quotes", {URL: ("HTTP 503", 3)})
+    s.record_failures("quotes", {URL: ("circuit open", 0)})
+    s.record_failures("book-detail", {"https://books.toscrape.com/x": ("ConnectError", 2)})
+    assert s.count_failed() == 2
+
+    # one row per URL; attempts accumulate and the latest reason wins
+    (row,) = s.failed_urls("quotes")
+    assert row == {"url": URL, "kind": "quotes", "reason": "circuit open", "attempts": 3}
+
+    s.clear_failed([URL])
+    assert [r["kind"] for r in s.failed_urls()] == ["book-detail"]
+    s.close()